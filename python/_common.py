@@ -0,0 +1,43 @@
+# _common.py
+# 作用：fetch_repos.py、rule_extract.py、llm_extract.py 共用的小工具，
+# 可选依赖（orjson、re2 等）的导入与回退只在这里处理一次
+# 各脚本都在 python/ 目录下运行，直接 from _common import ... 即可
+
+import json
+
+# 优先使用 google-re2（线性时间的 DFA 引擎，大 README 上不会灾难性回溯），未安装时回退到标准库 re
+import re
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# orjson 可选：解析速度明显快于标准库 json，未安装时回退
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """解析 JSON（bytes 或 str），优先使用 orjson"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def json_dumps(value) -> str:
+    """序列化为 JSON 字符串（保留中文），优先使用 orjson"""
+    return orjson.dumps(value).decode('utf-8') if orjson else json.dumps(value, ensure_ascii=False)
+
+
+def compile_pattern(pattern: str):
+    """编译正则：优先用 re2，re2 未安装或不支持该语法时回退到标准库 re"""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+# 写 CSV 时使用 1MB 缓冲，减少大量短行触发的底层 write 调用
+WRITE_BUFFER = 1 << 20
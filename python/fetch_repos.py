@@ -2,42 +2,225 @@
 # 作用：用 GitHub Search API 抓取高 star 仓库（前200），并保存 README 原文
 # 和仓库元数据（包括名称、星标、开发者名单、许可证类型、标签、各个发布版本）
 # 到 ./data/raw/，每个仓库一个文件夹，文件夹名称为 {owner}_{repo_name}
+# 仓库元数据通过 GraphQL API 批量获取（每次请求查询多个仓库），
+# 贡献者名单 GraphQL 不提供，仍走 REST API
+# 另存一份只含规则抽取所需字段的 metadata.slim.json，供 rule_extract.py 快速读取
 
 import os
-import requests
+import httpx
 import json
 from pathlib import Path
 import time
-from requests.exceptions import ConnectionError, Timeout
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from _common import json_loads
+
+# HTTP/2 需要 h2 包（pip install 'httpx[http2]'），未安装时退回 HTTP/1.1
+try:
+    import h2  # pyright: ignore[reportUnusedImport]
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
 
 # 获取 GitHub token（基于脚本目录计算相对路径，避免求绝对路径时出错）
+# 优先读取 github_tokens.txt（每行一个 token，轮换使用以叠加限流额度），
+# 不存在时回退到单个 token 的 github_token.txt
 script_dir = os.path.dirname(os.path.abspath(__file__))
-token_path = os.path.normpath(os.path.join(script_dir, '..', 'secrets', 'github_token.txt'))
+secrets_dir = os.path.normpath(os.path.join(script_dir, '..', 'secrets'))
+tokens_path = os.path.join(secrets_dir, 'github_tokens.txt')
+token_path = os.path.join(secrets_dir, 'github_token.txt')
+if os.path.isfile(tokens_path):
+    token_path = tokens_path
 if not os.path.isfile(token_path):
     raise ValueError(f"请确保 {token_path} 文件存在并包含 GitHub token")
 with open(token_path, 'r') as f:
-    GITHUB_TOKEN = f.read().strip()
+    GITHUB_TOKENS = [line.strip() for line in f if line.strip()]
 
-if not GITHUB_TOKEN:
+if not GITHUB_TOKENS:
     raise ValueError("GitHub token 不能为空")
 
-headers = {'Authorization': f'token {GITHUB_TOKEN}'}
 base_url = 'https://api.github.com'
+graphql_url = f'{base_url}/graphql'
+
+# 每个 GraphQL 请求通过别名（r0, r1, ...）批量查询的仓库数
+GRAPHQL_BATCH_SIZE = 20
+
+# 单个仓库需要的字段；README 先按 HEAD:README.md 取，取不到、被截断（大文件）或为二进制时再走 REST /readme
+REPO_FIELDS = '''
+    stargazerCount
+    url
+    licenseInfo { name }
+    primaryLanguage { name }
+    languages(first: 100, orderBy: {field: SIZE, direction: DESC}) { nodes { name } }
+    repositoryTopics(first: 100) { nodes { topic { name } } }
+    releases(first: 100, orderBy: {field: CREATED_AT, direction: DESC}) {
+        nodes { tagName }
+        pageInfo { hasNextPage endCursor }
+    }
+    readme: object(expression: "HEAD:README.md") { ... on Blob { text isTruncated isBinary } }
+'''
+
+# 发布版本超过一页时按游标继续翻页
+RELEASES_QUERY = '''
+query($owner: String!, $name: String!, $after: String) {
+    repository(owner: $owner, name: $name) {
+        releases(first: 100, after: $after, orderBy: {field: CREATED_AT, direction: DESC}) {
+            nodes { tagName }
+            pageInfo { hasNextPage endCursor }
+        }
+    }
+}
+'''
+
+# metadata.slim.json 中保留的字段（rule_extract.py 实际用到的字段）
+SLIM_FIELDS = ('stars', 'contributors', 'license', 'topics', 'languages', 'url')
+
+# 贡献者（按提交数降序）和发布版本（按时间倒序）只保留前若干个，
+# 避免超大仓库翻页上百次；知识图谱只需要主要贡献者和近期版本
+MAX_CONTRIBUTORS = 100
+MAX_RELEASES = 100
+
+# 并发抓取的线程数（GitHub 对并发请求有二级限流，不宜过大）
+MAX_WORKERS = 16
+
+# ETag 缓存：URL -> ETag，重跑时带 If-None-Match，304 响应不计入限流额度
+ETAG_CACHE_FILE = '.etag_cache.json'
+etag_cache = {}
+etag_lock = threading.Lock()
+
+# 所有线程共享一个 httpx.Client，复用 TCP/TLS 连接；连接池大小需覆盖并发线程数
+# 启用 HTTP/2 时多个请求在同一 TLS 连接上多路复用，减少握手和并发连接数
+SESSION = httpx.Client(
+    http2=HTTP2_ENABLED,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+)
+
+
+def rate_limit_wait(response, attempt=0) -> float:
+    """根据 GitHub 限流响应计算需要等待的秒数，未被限流时返回 0；attempt 为当前重试次数"""
+    if response.status_code not in (403, 429):
+        return 0
+    # 二级限流（secondary rate limit）通常会给出 Retry-After
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        return float(retry_after)
+    # 主限流耗尽时等待到 X-RateLimit-Reset
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        reset = float(response.headers.get('X-RateLimit-Reset', 0))
+        return max(reset - time.time(), 0) + 1
+    # 没有 Retry-After 的二级限流：GitHub 文档要求至少等待 60 秒，之后指数退避
+    if 'secondary rate limit' in response.text.lower():
+        return 60 * 2 ** attempt
+    return 0
+
+
+def load_etag_cache(path):
+    """从磁盘加载 ETag 缓存"""
+    if not os.path.isfile(path):
+        return
+    try:
+        with open(path, 'rb') as f:
+            etag_cache.update(json_loads(f.read()))
+    except Exception as e:
+        print(f"读取 ETag 缓存失败: {e}")
+
+def save_etag_cache(path):
+    """把 ETag 缓存写回磁盘"""
+    with etag_lock:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(etag_cache, f, indent=4, ensure_ascii=False)
+
+# 每个 token 在各限流资源类别（X-RateLimit-Resource）下的初始额度估计，之后以响应头为准
+RATE_LIMIT_DEFAULTS = {'core': 5000, 'graphql': 5000, 'search': 30}
 
+def rate_limit_resource(url) -> str:
+    """请求所属的 GitHub 限流资源类别：GraphQL、搜索与其余 REST 接口分别计额"""
+    if url == graphql_url:
+        return 'graphql'
+    if url.startswith(f'{base_url}/search/'):
+        return 'search'
+    return 'core'
 
-def make_request(url, headers=None, max_retries=3, timeout=10)->requests.Response: # pyright: ignore[reportReturnType]
-    """带重试机制的请求函数"""
+class TokenPool:
+    """GitHub token 轮换池（线程安全）：每次挑选剩余额度最多且未被限流的 token
+
+    额度和限流状态按 (token, 资源类别) 记录，搜索接口被限流不影响同一 token 的 REST/GraphQL 请求
+    """
+    
+    def __init__(self, tokens):
+        self.lock = threading.Lock()
+        self.tokens = list(tokens)
+        # (token, resource) -> 剩余额度 / 限流解除时间，未出现过的键按 RATE_LIMIT_DEFAULTS 计
+        self.remaining = {}
+        self.blocked_until = {}
+    
+    def acquire(self, resource='core'):
+        """返回 (token, 需要等待的秒数)；所有 token 都被限流时返回最早恢复的那个"""
+        with self.lock:
+            now = time.time()
+            keys = [(t, resource) for t in self.tokens]
+            for key in keys:
+                self.remaining.setdefault(key, RATE_LIMIT_DEFAULTS.get(resource, 5000))
+                self.blocked_until.setdefault(key, 0.0)
+            available = [k for k in keys if self.blocked_until[k] <= now]
+            if not available:
+                key = min(keys, key=self.blocked_until.__getitem__)
+                return key[0], self.blocked_until[key] - now
+            key = max(available, key=self.remaining.__getitem__)
+            # 先行扣减，使并发线程分散到不同 token 上
+            self.remaining[key] -= 1
+            return key[0], 0
+    
+    def update(self, token, resource, response, attempt=0):
+        """根据响应头更新 token 在该资源类别下的剩余额度，被限流时返回需要等待的秒数"""
+        # 以响应头报告的资源类别为准
+        key = (token, response.headers.get('X-RateLimit-Resource', resource))
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        wait = rate_limit_wait(response, attempt)
+        with self.lock:
+            if remaining is not None:
+                self.remaining[key] = int(remaining)
+            if wait:
+                self.blocked_until[key] = time.time() + wait
+        return wait
+
+TOKEN_POOL = TokenPool(GITHUB_TOKENS)
+
+def make_request(url, headers=None, max_retries=3, timeout=10, method='GET', json_body=None, conditional=False)->httpx.Response: # pyright: ignore[reportReturnType]
+    """带重试机制的请求函数，从 TOKEN_POOL 轮换 token；某个 token 被限流时
+    换用其他 token 重试，全部被限流时按响应头退避
+
+    conditional=True 时带上已记录的 ETag 发送 If-None-Match，内容未变化时
+    GitHub 返回 304，调用方需自行复用旧数据；也只有这类请求成功时才记录 ETag
+    """
+    if conditional:
+        with etag_lock:
+            etag = etag_cache.get(url)
+        if etag:
+            headers = {**(headers or {}), 'If-None-Match': etag}
+    resource = rate_limit_resource(url)
     for attempt in range(max_retries):
+        token, wait = TOKEN_POOL.acquire(resource)
+        if wait:
+            print(f"所有 token 均被限流，等待 {wait:.0f} 秒: {url}")
+            time.sleep(wait)
+        request_headers = {**(headers or {}), 'Authorization': f'token {token}'}
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            if response is not None:
-                return response
-        except (ConnectionError, Timeout) as e:
+            response = SESSION.request(method, url, headers=request_headers, json=json_body, timeout=timeout)
+        except httpx.TransportError as e:
             if attempt < max_retries - 1:
                 print(f"请求失败，重试 {attempt+1}/{max_retries}: {e}")
                 time.sleep(2 ** attempt)  # 指数退避
-            else:
-                raise
+                continue
+            raise
+        if TOKEN_POOL.update(token, resource, response, attempt) and attempt < max_retries - 1:
+            print(f"token 触发 GitHub 限流，换用其他 token 重试: {url}")
+            continue
+        if conditional and response.status_code == 200 and response.headers.get('ETag'):
+            with etag_lock:
+                etag_cache[url] = response.headers['ETag']
+        return response
 
 def get_top_repos(limit=200):
     """获取前 limit 个高星标仓库"""
@@ -47,7 +230,7 @@ def get_top_repos(limit=200):
     while len(repos) < limit:
         url = f'{base_url}/search/repositories?q=stars:>1&sort=stars&order=desc&page={page}&per_page={per_page}'
         try:
-            response = make_request(url, headers)
+            response = make_request(url)
         except Exception as e:
             print(f"获取仓库列表失败: {e}")
             break
@@ -61,100 +244,177 @@ def get_top_repos(limit=200):
         page += 1
     return repos[:limit]
 
-def get_repo_data(owner, repo):
-    """获取仓库的元数据和 README"""
-    # 获取仓库基本信息
-    repo_url = f'{base_url}/repos/{owner}/{repo}'
+def graphql_query(query, variables):
+    """执行一次 GraphQL 查询，返回 data 字段；请求失败时返回 None"""
     try:
-        repo_response = make_request(repo_url, headers)
+        response = make_request(graphql_url, timeout=30, method='POST',
+                                json_body={'query': query, 'variables': variables})
     except Exception as e:
-        print(f"获取仓库 {owner}/{repo} 信息失败: {e}")
-        return None, ""
-    if repo_response.status_code != 200: # type: ignore
-        print(f"获取仓库 {owner}/{repo} 信息失败: {repo_response.status_code}")
-        return None, ""
-    
-    repo_data = repo_response.json()
-    
-    # 获取 README
-    readme_content = ""
+        print(f"GraphQL 请求失败: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"GraphQL 请求失败: {response.status_code} - {response.text}")
+        return None
+    result = response.json()
+    # 部分仓库出错（如已删除）时其余别名仍有数据，只打印错误
+    for error in result.get('errors', []):
+        print(f"GraphQL 错误: {error.get('message')}")
+    return result.get('data')
+
+def get_repo_infos(repo_keys):
+    """按 GRAPHQL_BATCH_SIZE 分批查询仓库元数据，返回 {(owner, repo): 仓库节点}"""
+    infos = {}
+    for start in range(0, len(repo_keys), GRAPHQL_BATCH_SIZE):
+        batch = repo_keys[start:start + GRAPHQL_BATCH_SIZE]
+        params = []
+        fields = []
+        variables = {}
+        for i, (owner, repo) in enumerate(batch):
+            params.append(f'$o{i}: String!, $n{i}: String!')
+            fields.append(f'r{i}: repository(owner: $o{i}, name: $n{i}) {{{REPO_FIELDS}}}')
+            variables[f'o{i}'] = owner
+            variables[f'n{i}'] = repo
+        query = 'query(' + ', '.join(params) + ') {\n' + '\n'.join(fields) + '\n}'
+        data = graphql_query(query, variables) or {}
+        for i, key in enumerate(batch):
+            if data.get(f'r{i}'):
+                infos[key] = data[f'r{i}']
+    return infos
+
+def get_releases(owner, repo, releases_conn, max_releases=MAX_RELEASES):
+    """从 GraphQL releases 连接中取出最近 max_releases 个 tag，不足且有下一页时继续翻页"""
+    releases = [r['tagName'] for r in releases_conn['nodes']]
+    page_info = releases_conn['pageInfo']
+    while page_info['hasNextPage'] and len(releases) < max_releases:
+        data = graphql_query(RELEASES_QUERY, {'owner': owner, 'name': repo, 'after': page_info['endCursor']})
+        if not data or not data.get('repository'):
+            break
+        conn = data['repository']['releases']
+        releases.extend(r['tagName'] for r in conn['nodes'])
+        page_info = conn['pageInfo']
+    return releases[:max_releases]
+
+def get_readme(owner, repo, previous_readme=None):
+    """通过 REST /readme 获取 README（可识别 readme.md、README.rst 等各种文件名）
+
+    previous_readme 为磁盘上已有的 README，未变化（304）时直接复用；
+    请求失败或被限流时同样返回 previous_readme，不用空内容覆盖已有的 README
+    """
+    # 只有首次抓取（没有旧 README）失败时才退回空字符串
+    fallback = previous_readme if previous_readme is not None else ""
     readme_url = f'{base_url}/repos/{owner}/{repo}/readme'
     try:
-        readme_response = make_request(readme_url, headers)
+        readme_response = make_request(readme_url, conditional=previous_readme is not None)
     except Exception as e:
         print(f"获取 README 失败: {e}")
-        readme_response = None
-    if readme_response and readme_response.status_code == 200:
-        readme_data = readme_response.json()
-        try:
-            download_response = make_request(readme_data['download_url'], headers)
-        except Exception as e:
-            print(f"下载 README 失败: {e}")
-            download_response = None
-        if download_response and download_response.status_code == 200:
-            readme_content = download_response.text
+        return fallback
+    if readme_response.status_code == 304:
+        return previous_readme
+    # 404 表示仓库确实没有 README，其余错误视为本次获取失败
+    if readme_response.status_code == 404:
+        return ""
+    if readme_response.status_code != 200:
+        print(f"获取 README 失败: {owner}/{repo} {readme_response.status_code}")
+        return fallback
+    readme_data = readme_response.json()
+    try:
+        download_response = make_request(readme_data['download_url'])
+    except Exception as e:
+        download_response = None
+        print(f"下载 README 失败: {e}")
+    if download_response is not None and download_response.status_code == 200:
+        return download_response.text
+    if download_response is not None:
+        print(f"下载 README 失败: {owner}/{repo} {download_response.status_code}")
+    # 丢弃本次记录的 ETag，否则下次会得到 304 而一直沿用旧 README
+    with etag_lock:
+        etag_cache.pop(readme_url, None)
+    return fallback
+
+def load_previous(folder_path):
+    """读取上次抓取保存的元数据和 README，不存在时对应项为 None"""
+    metadata, readme = None, None
+    try:
+        metadata = json_loads((folder_path / 'metadata.json').read_bytes())
+        with open(folder_path / 'README.md', 'r', encoding='utf-8') as f:
+            readme = f.read()
+    except (OSError, ValueError):
+        pass
+    return metadata, readme
+
+def get_repo_data(owner, repo, repo_info=None, previous=(None, None),
+                  max_contributors=MAX_CONTRIBUTORS, max_releases=MAX_RELEASES):
+    """获取仓库的元数据和 README
+
+    repo_info 为 get_repo_infos 预取的 GraphQL 节点；previous 为 load_previous
+    读出的上次结果，REST 接口返回 304 时复用其中对应的部分
+    """
+    previous_metadata, previous_readme = previous
+    if repo_info is None:
+        repo_info = get_repo_infos([(owner, repo)]).get((owner, repo))
+    if repo_info is None:
+        print(f"获取仓库 {owner}/{repo} 信息失败")
+        return None, ""
     
-    # 获取贡献者
+    # 获取 README：GraphQL 未取到 README.md，或返回的 text 不完整/不可用时回退到 REST
+    readme = repo_info.get('readme') or {}
+    readme_content = readme.get('text')
+    if readme_content is None or readme.get('isTruncated') or readme.get('isBinary'):
+        readme_content = get_readme(owner, repo, previous_readme)
+    
+    # 获取贡献者（前 max_contributors 个，默认只需请求一页）
     contributors = []
     contributors_url = f'{base_url}/repos/{owner}/{repo}/contributors'
+    per_page = min(max_contributors, 100)
     page = 1
-    while True:
+    while len(contributors) < max_contributors:
         try:
-            response = make_request(f'{contributors_url}?page={page}&per_page=100', headers)
+            # 第一页未变化即认为贡献者名单未变化
+            response = make_request(f'{contributors_url}?page={page}&per_page={per_page}',
+                                    conditional=page == 1 and previous_metadata is not None)
         except Exception as e:
             print(f"获取贡献者失败: {e}")
             break
+        if response.status_code == 304: # pyright: ignore[reportOptionalMemberAccess]
+            contributors = list(previous_metadata.get('contributors', [])) # pyright: ignore[reportOptionalMemberAccess]
+            break
         if response.status_code != 200: # pyright: ignore[reportOptionalMemberAccess]
+            # 重试后仍被限流时不能把不完整的名单当作结果写盘：有上次结果则沿用，否则本次跳过该仓库
+            if rate_limit_wait(response):
+                if previous_metadata is None:
+                    print(f"获取 {owner}/{repo} 贡献者时被限流，本次跳过该仓库")
+                    return None, ""
+                print(f"获取 {owner}/{repo} 贡献者时被限流，沿用上次的贡献者名单")
+                contributors = list(previous_metadata.get('contributors', []))
             break
         data = response.json()
         if not data:
             break
         contributors.extend([c['login'] for c in data])
+        if len(data) < per_page:
+            break
         page += 1
+    contributors = contributors[:max_contributors]
     
     # 获取许可证
-    license_type = repo_data.get('license', {}).get('name') if repo_data.get('license') else None
+    license_type = repo_info['licenseInfo']['name'] if repo_info.get('licenseInfo') else None
     
-    # 获取主语言和所有语言分布
-    primary_language = repo_data.get('language')
-    languages = []
-    languages_url = f'{base_url}/repos/{owner}/{repo}/languages'
-    try:
-        lang_resp = make_request(languages_url, headers)
-        if lang_resp and lang_resp.status_code == 200:
-            lang_json = lang_resp.json()
-            languages = list(lang_json.keys())
-    except Exception as e:
-        print(f"获取语言分布失败: {e}")
-        languages = []
+    # 获取主语言和所有语言分布（按代码量降序）
+    primary_language = repo_info['primaryLanguage']['name'] if repo_info.get('primaryLanguage') else None
+    languages = [lang['name'] for lang in repo_info['languages']['nodes']]
     
     # 获取标签（topics）
-    topics = repo_data.get('topics', [])
+    topics = [t['topic']['name'] for t in repo_info['repositoryTopics']['nodes']]
     
     # 获取发布版本
-    releases = []
-    releases_url = f'{base_url}/repos/{owner}/{repo}/releases'
-    page = 1
-    while True:
-        try:
-            response = make_request(f'{releases_url}?page={page}&per_page=100', headers)
-        except Exception as e:
-            print(f"获取发布版本失败: {e}")
-            break
-        if response.status_code != 200: # pyright: ignore[reportOptionalMemberAccess]
-            break
-        data = response.json()
-        if not data:
-            break
-        releases.extend([r['tag_name'] for r in data])
-        page += 1
+    releases = get_releases(owner, repo, repo_info['releases'], max_releases)
     
     metadata = {
         'name': repo,
-        'stars': repo_data['stargazers_count'],
+        'stars': repo_info['stargazerCount'],
         'contributors': contributors,
         'license': license_type,
-        'url': repo_data.get('html_url', f'https://github.com/{owner}/{repo}'),
+        'url': repo_info.get('url') or f'https://github.com/{owner}/{repo}',
         'primary_language': primary_language,
         'languages': languages,
         'topics': topics,
@@ -163,35 +423,63 @@ def get_repo_data(owner, repo):
     
     return metadata, readme_content
 
+def save_repo_data(folder_path, metadata, readme, previous_readme=None):
+    """把仓库元数据和 README 写入 folder_path；README 未变化时跳过写盘"""
+    folder_path.mkdir(exist_ok=True)
+    
+    # 保存元数据
+    with open(folder_path / 'metadata.json', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4, ensure_ascii=False)
+    with open(folder_path / 'metadata.slim.json', 'w', encoding='utf-8') as f:
+        json.dump({k: metadata[k] for k in SLIM_FIELDS}, f, ensure_ascii=False)
+    
+    # 保存 README
+    if readme != previous_readme:
+        with open(folder_path / 'README.md', 'w', encoding='utf-8') as f:
+            f.write(readme)
+
+def fetch_and_save(owner, repo, repo_info, raw_dir):
+    """抓取单个仓库并写盘（在工作线程中执行），返回是否成功"""
+    folder_path = raw_dir / f'{owner}_{repo}'
+    previous = load_previous(folder_path)
+    metadata, readme = get_repo_data(owner, repo, repo_info, previous)
+    if metadata is None:
+        return False
+    save_repo_data(folder_path, metadata, readme, previous[1])
+    return True
+
 def main():
     # 使用脚本目录计算 data/raw 的路径，避免在某些环境下 Path.resolve 出错
     script_dir = os.path.dirname(os.path.abspath(__file__))
     raw_dir = Path(os.path.join(script_dir, '..', 'data', 'raw'))
     raw_dir.mkdir(parents=True, exist_ok=True)
+    etag_cache_path = raw_dir / ETAG_CACHE_FILE
+    load_etag_cache(etag_cache_path)
     
     repos = get_top_repos()
     print(f"获取到 {len(repos)} 个仓库")
     
-    for i, repo in enumerate(repos):
-        owner = repo['owner']['login']
-        repo_name = repo['name']
-        folder_name = f'{owner}_{repo_name}'
-        folder_path = raw_dir / folder_name
-        folder_path.mkdir(exist_ok=True)
-        
-        print(f"处理 {i+1}/{len(repos)}: {owner}/{repo_name}")
-        
-        metadata, readme = get_repo_data(owner, repo_name)
-        if metadata is None:
-            continue
-        
-        # 保存元数据
-        with open(folder_path / 'metadata.json', 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=4, ensure_ascii=False)
+    # 先用 GraphQL 批量取回所有仓库的元数据
+    repo_keys = [(repo['owner']['login'], repo['name']) for repo in repos]
+    repo_infos = get_repo_infos(repo_keys)
+    
+    # 抓取是网络 IO 密集型，用线程池并发处理各仓库；每个工作线程抓完即自行写盘，
+    # 写盘与其他线程的网络请求相互重叠，主线程只汇报进度
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {}
+        for owner, repo_name in repo_keys:
+            future = executor.submit(fetch_and_save, owner, repo_name, repo_infos.get((owner, repo_name)), raw_dir)
+            futures[future] = (owner, repo_name)
         
-        # 保存 README
-        with open(folder_path / 'README.md', 'w', encoding='utf-8') as f:
-            f.write(readme)
+        for i, future in enumerate(as_completed(futures)):
+            owner, repo_name = futures[future]
+            print(f"处理 {i+1}/{len(repos)}: {owner}/{repo_name}")
+            try:
+                future.result()
+            except Exception as e:
+                print(f"处理仓库 {owner}/{repo_name} 失败: {e}")
+    
+    save_etag_cache(etag_cache_path)
 
 if __name__ == '__main__':
     main()
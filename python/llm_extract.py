@@ -4,22 +4,163 @@
 # 每个仓库生成一段description，relatedRepository可以是一个或多个（如果有的话）
 # 存到/home/byx/projects/OpenKG-GitHubRepository-KG/data/triples/llm_extracted_triples.csv
 # 需要提前在 secrets 文件夹放置 deepseek_api_key.txt 和 deepseek_api_url.txt（如果没有则跳过）
+# 各仓库的请求通过 asyncio 并发发出，并发数由 max_concurrency 控制
+# 模型响应缓存在 data/cache/llm.sqlite，README 未变化时重跑不再调用 API；
+# 每个结果返回后立即提交到缓存，中断后重跑只会请求尚未完成的仓库
 
 import os
 import json
 import csv
-from typing import Optional, Dict
-from openai import OpenAI
+import asyncio
+import hashlib
+import sqlite3
+from typing import Optional, Dict, List, Tuple
+import httpx
+from openai import AsyncOpenAI
+from _common import json_loads, json_dumps, compile_pattern, WRITE_BUFFER
+
+
+# tiktoken 可选：用于按 token 截断 README，未安装时按字符粗略估算
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+# 编码在第一次截断时才加载（冷缓存时 get_encoding 会联网下载 BPE 文件），避免导入模块时阻塞
+_ENCODING = None
+_ENCODING_LOADED = False
+
+
+MODEL = "deepseek-chat"
+
+# 发送给模型的 README 最大 token 数（清洗后），提取简介和相关仓库不需要全文
+MAX_README_TOKENS = 4096
+# 读取 README 的最大字节数：清洗并截断到 MAX_README_TOKENS 用不到更多内容，
+# 超大 README（整份文档、变更日志等）不再整体读入和解码
+MAX_README_BYTES = 128 * 1024
+
+# README 清洗用的正则：HTML 注释、代码块、图片/徽章、空链接、HTML 标签、多余空行
+# 只用 RE2 支持的语法（无反向引用、无环视），标志写成内联形式以兼容 re 与 re2
+_HTML_COMMENT_RE = compile_pattern(r'(?s)<!--.*?-->')
+# ``` 与 ~~~ 两种代码块合并为一个模式，一遍扫描
+_CODE_FENCE_RE = compile_pattern(r'(?sm)^(?:```.*?^```|~~~.*?^~~~)[ \t]*$')
+_MD_IMAGE_RE = compile_pattern(r'!\[[^\]]*\]\([^)]*\)')
+_EMPTY_LINK_RE = compile_pattern(r'\[\s*\]\([^)]*\)')
+_HTML_HREF_RE = compile_pattern(r'(?i)<a\s[^>]*?href=["\']([^"\']+)["\'][^>]*>')
+_HTML_TAG_RE = compile_pattern(r'</?[A-Za-z][^>]*>')
+# 写成字面量前缀 \n\n\n+ 而非 \n{3,}，re 可以先按字面量快速定位
+_BLANK_LINES_RE = compile_pattern(r'\n\n\n+')
+
+
+def _clean_readme(md: str) -> str:
+    """去掉 README 中与简介/相关仓库无关的噪声（徽章、图片、代码块、HTML 标签等）"""
+    # 每个正则先用字面量做 in 预检（C 层的子串查找），文中没有触发字符串时整遍跳过
+    if '<!--' in md:
+        md = _HTML_COMMENT_RE.sub('', md)
+    if '```' in md or '~~~' in md:
+        md = _CODE_FENCE_RE.sub('', md)
+    if '](' in md:
+        md = _MD_IMAGE_RE.sub('', md)
+        md = _EMPTY_LINK_RE.sub('', md)
+    if '<' in md:
+        # HTML 链接保留 href，相关仓库常以 <a href="..."> 形式出现
+        md = _HTML_HREF_RE.sub(lambda m: f' {m.group(1)} ', md)
+        md = _HTML_TAG_RE.sub('', md)
+    # 行尾空白用 rstrip 去除，比逐个空格尝试 [ \t]+$ 的正则快得多
+    md = '\n'.join(line.rstrip(' \t') for line in md.split('\n'))
+    md = _BLANK_LINES_RE.sub('\n\n', md)
+    return md.strip()
+
+
+def _get_encoding():
+    """返回 tiktoken 编码，只加载一次；不可用时返回 None"""
+    global _ENCODING, _ENCODING_LOADED
+    if not _ENCODING_LOADED:
+        _ENCODING_LOADED = True
+        if tiktoken is not None:
+            try:
+                _ENCODING = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                print(f"Failed to load tiktoken encoding, falling back to estimation: {e}")
+    return _ENCODING
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """把文本截断到 max_tokens 个 token 以内"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+    # 无 tiktoken 时粗略估算：ASCII 约 4 个字符一个 token，中文等其他字符约 1 个字符一个 token
+    budget = max_tokens * 4
+    for i, ch in enumerate(text):
+        budget -= 1 if ch < '\x80' else 4
+        if budget < 0:
+            return text[:i]
+    return text
+
+# 固定不变的指令放在 system 消息里、位于请求最前面，每次调用的前缀逐字节相同，
+# 可以命中 Deepseek 的上下文硬盘缓存（按前缀自动缓存，命中部分按缓存价计费）；
+# 随仓库变化的内容只放在最后的 user 消息中
+SYSTEM_PROMPT = """你将收到一个 GitHub 仓库的名称和 README 内容，请从 README 中提取以下信息，并以 JSON 格式返回：
+1. description: 对该项目的简短描述（1-2 句）
+2. relatedRepository: 如果 README 中提到的相关仓库，记录其url（列表，可以为空）
+
+请只返回 JSON，格式如下：
+{
+    "description": "...",
+    "relatedRepository": ["url_repo1", "url_repo2"]
+}
+"""
+
+USER_TEMPLATE = """仓库：{repo}
+
+README 内容：
+{readme}
+"""
+
+
+class LLMCache:
+    """LLM 响应的磁盘缓存（SQLite），以模型和完整提示词的 sha256 为键"""
+    
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str) -> str:
+        """计算缓存键"""
+        return hashlib.sha256(f"{model}|{system_prompt}|{prompt}".encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """读取缓存的提取结果，未命中时返回 None"""
+        row = self.conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        return json_loads(row[0]) if row else None
+    
+    def set(self, key: str, value: Dict):
+        """写入提取结果"""
+        self.conn.execute("INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)",
+                          (key, json_dumps(value)))
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
 
 
 class LLMExtractor:
     """使用 LLM（Deepseek）从 README 提取关系信息"""
     
-    def __init__(self, base_path: str = "/home/byx/projects/OpenKG-GitHubRepository-KG"):
+    def __init__(self, base_path: str = "/home/byx/projects/OpenKG-GitHubRepository-KG",
+                 max_concurrency: int = 16):
         self.base_path = base_path
+        self.max_concurrency = max_concurrency
         self.raw_data_path = os.path.join(base_path, "data/raw")
         self.triples_path = os.path.join(base_path, "data/triples")
         self.secrets_path = os.path.join(base_path, "secrets")
+        self.cache_path = os.path.join(base_path, "data/cache/llm.sqlite")
         
         # 创建输出目录
         os.makedirs(self.triples_path, exist_ok=True)
@@ -29,14 +170,25 @@ class LLMExtractor:
         self.api_url = self._load_secret("deepseek_api_url.txt")
         self.available = self.api_key and self.api_url
         
-        # 初始化 OpenAI 兼容客户端
-        self.client = None
-        if self.available:
-            self.client = OpenAI(api_key=self.api_key, base_url=self.api_url)
+        # OpenAI 兼容的异步客户端，在 _extract_all 的事件循环内创建（见 _create_client）
+        self.client: Optional[AsyncOpenAI] = None
+        
+        # 响应缓存及命中统计（没有 API 配置时不会用到，也就不创建缓存文件）
+        self.cache: Optional[LLMCache] = LLMCache(self.cache_path) if self.available else None
+        self.stats = {"hits": 0, "misses": 0, "prompt_tokens": 0, "prompt_cache_hit_tokens": 0}
         
         # 存储提取的三元组
         self.extracted_triples = []
     
+    def _create_client(self) -> AsyncOpenAI:
+        """创建异步客户端：每次提取只建一次，连接池按并发数配置，
+        所有请求复用同一批 keep-alive 连接（免去重复的 DNS/TLS 握手）"""
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.api_url, http_client=http_client)
+    
     def _load_secret(self, filename: str) -> Optional[str]:
         """从 secrets 文件夹加载密钥或 URL"""
         file_path = os.path.join(self.secrets_path, filename)
@@ -48,35 +200,39 @@ class LLMExtractor:
                 print(f"Error reading {filename}: {e}")
         return None
     
-    def _extract_with_llm(self, readme_content: str, repo_name: str) -> Dict:
+    async def _extract_with_llm(self, readme_content: str, repo_name: str) -> Dict:
         """使用 LLM 从 README 提取 description 和 relatedRepository"""
         if not self.available or not self.client:
             print(f"Skipping {repo_name}: API credentials not available")
             return {}
         
-        prompt = f"""从以下 GitHub 仓库的 README 中提取以下信息，并以 JSON 格式返回：
-1. description: 对该项目的简短描述（1-2 句）
-2. relatedRepository: 如果 README 中提到的相关仓库，记录其url（列表，可以为空）
-
-README 内容：
-{readme_content[:100000]}  # 限制内容长度以避免 token 超限
-
-请只返回 JSON，格式如下：
-{{
-    "description": "...",
-    "relatedRepository": ["url_repo1", "url_repo2"]
-}}
-"""
+        # 清洗噪声并按 token 数截断，控制输入长度
+        readme_content = _truncate_tokens(_clean_readme(readme_content), MAX_README_TOKENS)
+        prompt = USER_TEMPLATE.format(repo=repo_name, readme=readme_content)
+        
+        # 命中缓存则直接返回，不再调用 API
+        cache_key = LLMCache.make_key(MODEL, SYSTEM_PROMPT, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+        self.stats["misses"] += 1
         
         try:
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
+            response = await self.client.chat.completions.create(
+                model=MODEL,
                 messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3
             )
             
+            # 统计前缀缓存命中的 token 数（Deepseek 在 usage 中返回 prompt_cache_hit_tokens）
+            if response.usage:
+                self.stats["prompt_tokens"] += response.usage.prompt_tokens
+                self.stats["prompt_cache_hit_tokens"] += getattr(response.usage, "prompt_cache_hit_tokens", 0) or 0
+            
             content = response.choices[0].message.content
             if not content:
                 print(f"Empty response content for {repo_name}")
@@ -94,8 +250,9 @@ README 内容：
             
             try:
                 # 尝试解析 JSON
-                extracted = json.loads(content)
+                extracted = json_loads(content)
                 print(f"Content was: {content}...")
+                self.cache.set(cache_key, extracted)
                 return extracted
             except json.JSONDecodeError:
                 # 如果不是有效的 JSON，返回空字典
@@ -106,54 +263,84 @@ README 内容：
             print(f"Error extracting from {repo_name}: {e}")
             return {}
     
+    async def _extract_all(self, readmes: List[Tuple[str, str]]) -> List[Dict]:
+        """并发提取所有 README，返回结果与输入顺序一致"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def extract_one(repo_dir: str, readme_content: str) -> Dict:
+            async with semaphore:
+                return await self._extract_with_llm(readme_content, repo_dir)
+        
+        async def extract_all() -> List[Dict]:
+            return await asyncio.gather(*(extract_one(repo_dir, content) for repo_dir, content in readmes))
+        
+        if not self.available:
+            return await extract_all()
+        # 客户端与事件循环同生命周期：async with 退出时关闭连接池，不会遗留到 asyncio.run 结束之后
+        async with self._create_client() as client:
+            self.client = client
+            try:
+                return await extract_all()
+            finally:
+                self.client = None
+    
+    def _add_triples(self, repo_dir: str, extracted: Dict):
+        """把单个仓库的提取结果转为三元组"""
+        if extracted:
+            description = extracted.get("description", "")
+            if description:
+                self.extracted_triples.append((repo_dir, "has_description", description))
+            
+            related_repos = extracted.get("relatedRepository", [])
+            if isinstance(related_repos, list):
+                for related_repo in related_repos:
+                    if related_repo:
+                        self.extracted_triples.append((repo_dir, "has_related_repository", related_repo))
+            
+            print(f"Processed {repo_dir}: {len(self.extracted_triples)} triples so far")
+        else:
+            print(f"No information extracted from {repo_dir}")
+    
     def process_repositories(self):
         """处理 raw 目录下所有仓库的 README"""
-        for repo_dir in os.listdir(self.raw_data_path):
-            repo_path = os.path.join(self.raw_data_path, repo_dir)
-            
-            if not os.path.isdir(repo_path):
-                continue
+        readmes = []
+        # scandir 的 DirEntry 自带目录项类型，is_dir() 无需额外 stat
+        with os.scandir(self.raw_data_path) as it:
+            repo_entries = [entry for entry in it if entry.is_dir()]
+        for entry in repo_entries:
+            repo_dir = entry.name
             
             # 读取 README
-            readme_file = os.path.join(repo_path, "README.md")
-            if not os.path.exists(readme_file):
+            readme_file = os.path.join(entry.path, "README.md")
+            try:
+                # 按字节读取上限后一次解码；截断处可能切开多字节字符，用 replace 容错
+                with open(readme_file, 'rb') as f:
+                    readme_content = f.read(MAX_README_BYTES).decode('utf-8', 'replace')
+                # 二进制模式不做换行转换，需与文本模式一样统一为 \n，否则清洗正则按行匹配会失效
+                readme_content = readme_content.replace('\r\n', '\n').replace('\r', '\n')
+            except FileNotFoundError:
                 print(f"Skipping {repo_dir}: no README.md found")
                 continue
-            
-            try:
-                with open(readme_file, 'r', encoding='utf-8') as f:
-                    readme_content = f.read()
             except Exception as e:
                 print(f"Error reading README for {repo_dir}: {e}")
                 continue
             
-            # 使用 LLM 提取信息
-            extracted = self._extract_with_llm(readme_content, repo_dir)
-            
-            # 生成三元组
-            if extracted:
-                description = extracted.get("description", "")
-                if description:
-                    self.extracted_triples.append((repo_dir, "has_description", description))
-                
-                related_repos = extracted.get("relatedRepository", [])
-                if isinstance(related_repos, list):
-                    for related_repo in related_repos:
-                        if related_repo:
-                            self.extracted_triples.append((repo_dir, "has_related_repository", related_repo))
-                
-                print(f"Processed {repo_dir}: {len(self.extracted_triples)} triples so far")
-            else:
-                print(f"No information extracted from {repo_dir}")
+            readmes.append((repo_dir, readme_content))
+        
+        # 使用 LLM 并发提取信息；README 未变化的仓库直接命中缓存，不再调用 API
+        results = asyncio.run(self._extract_all(readmes))
+        
+        # 生成三元组
+        for (repo_dir, _), extracted in zip(readmes, results):
+            self._add_triples(repo_dir, extracted)
     
     def save_triples(self):
         """保存提取的三元组到 CSV 文件"""
         triples_file = os.path.join(self.triples_path, "llm_extracted_triples.csv")
-        with open(triples_file, 'w', newline='', encoding='utf-8') as f:
+        with open(triples_file, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as f:
             writer = csv.writer(f)
             writer.writerow(['subject', 'predicate', 'object'])
-            for triple in self.extracted_triples:
-                writer.writerow(triple)
+            writer.writerows(self.extracted_triples)
         print(f"Saved {len(self.extracted_triples)} LLM-extracted triples to {triples_file}")
         print(f"Output file: {triples_file}")
     
@@ -165,8 +352,13 @@ README 内容：
         
         print("开始 LLM 提取...")
         print(f"Using API endpoint: {self.api_url}")
-        self.process_repositories()
-        self.save_triples()
+        try:
+            self.process_repositories()
+            self.save_triples()
+        finally:
+            self.cache.close()
+        print(f"LLM 缓存命中 {self.stats['hits']} 次，未命中 {self.stats['misses']} 次")
+        print(f"输入 token {self.stats['prompt_tokens']}，其中前缀缓存命中 {self.stats['prompt_cache_hit_tokens']}")
         print("LLM 提取完成！")
 
 
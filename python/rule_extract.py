@@ -8,16 +8,175 @@
 # 3.生成候选三元组
 # 参考schema/prperties.json内的属性定义，生成候选三元组，
 # 置于 data/triples/ 目录下，命名为 candidate_triples.csv
+# README 中指向其他 GitHub 仓库的链接作为 has_related_repository 候选三元组
+# （out_format='parquet' 时另存为 candidate_triples.parquet，需要 pyarrow）
 
 import os
-import json
+import sys
 import csv
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 from pathlib import Path
-from typing import Set, Dict, List, Tuple, Optional
+from typing import Set, Dict, List, Tuple, Optional, Iterator
+
+from _common import json_loads, compile_pattern, WRITE_BUFFER
+
+
+def _intern(value):
+    """驻留字符串：许可证、语言、标签等在各仓库间大量重复，驻留后只保留一份对象，
+    集合查找和三元组哈希比较时可直接按指针判等"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# README 中的 GitHub 仓库链接（只用 RE2 支持的语法）
+_GITHUB_REPO_RE = compile_pattern(r'https?://(?:www\.)?github\.com/([A-Za-z0-9-]+)/([A-Za-z0-9_.-]+)')
+# github.com 下不是用户/组织名的一级路径
+# （users/<name>/... 是个人主页下的页面，如赞助链接，也不是仓库）
+_GITHUB_RESERVED_OWNERS = {
+    'about', 'apps', 'codespaces', 'collections', 'customer-stories', 'enterprise', 'explore',
+    'features', 'login', 'marketplace', 'new', 'notifications', 'orgs', 'pricing', 'readme',
+    'resources', 'search', 'security', 'settings', 'site', 'solutions', 'sponsors', 'topics',
+    'trending', 'user-attachments', 'users',
+}
+# 以图片扩展名结尾的路径段是徽章/图片（如 github.com/codespaces/badge.svg），不是仓库名
+_IMAGE_SUFFIXES = ('.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico')
+
+def build_repo_triples(repo_dir: str, entities: Dict, readme_entities: Dict) -> List[Tuple]:
+    """按仓库生成候选三元组（基于该仓库的实际信息），不做跨仓库笛卡尔积
+
+    纯函数、不依赖实例状态，可直接用 Cython 纯 Python 模式编译，也可在子进程中调用
+    """
+    # 列表字段用 zip/repeat 批量生成，循环在 C 层完成
+    triples: List[Tuple] = []
+    triples.extend(zip(repeat(repo_dir), repeat('uses_language'), filter(None, entities.get('languages', []))))
+    lic = entities.get('license')
+    if lic:
+        triples.append((repo_dir, 'has_license', lic))
+    triples.extend(zip(repeat(repo_dir), repeat('has_tag'), filter(None, entities.get('tags', []))))
+    # 星数三元组
+    stars = entities.get('stars')
+    if stars is not None:
+        triples.append((repo_dir, 'has_stars', stars))
+    # 仓库链接三元组
+    url = entities.get('url')
+    if url:
+        triples.append((repo_dir, 'has_url', url))
+    # 贡献者三元组
+    triples.extend(zip(repeat(repo_dir), repeat('has_contributor'), filter(None, entities.get('contributors', []))))
+    # 相关仓库三元组（排除指向自身的链接）
+    own_url = (url or '').lower()
+    triples.extend((repo_dir, 'has_related_repository', related)
+                   for related in readme_entities.get('related_repositories', ())
+                   if related.lower() != own_url)
+    return triples
+
+def extract_from_metadata(metadata_path: str, repo_name: str) -> Dict:
+    """从metadata.json文件提取实体信息（文件不存在时抛出 FileNotFoundError）"""
+    try:
+        with open(metadata_path, 'rb') as f:
+            metadata = json_loads(f.read())
+        
+        entities = {
+            'repository': repo_name,
+            'stars': metadata.get('stars', 0),
+            'contributors': metadata.get('contributors', []),
+            'license': metadata.get('license', ''),
+            'tags': metadata.get('topics', []),
+            # languages 在 fetch_repos.py 中已保存为列表
+            'languages': metadata.get('languages', []),
+            'url': metadata.get('url', '')
+        }
+        
+        return entities
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        print(f"Error reading {metadata_path}: {e}")
+        return {}
+
+def extract_from_readme(readme_path: str) -> Dict:
+    """从README文件提取相关仓库链接（文件不存在时抛出 FileNotFoundError）"""
+    related = set()
+    try:
+        with open(readme_path, 'rb') as f:
+            # 空文件无法 mmap
+            if os.fstat(f.fileno()).st_size == 0:
+                return {'related_repositories': related}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # 字节级预检：不含 github.com 的 README 不解码、不做正则扫描
+                start = mm.find(b'github.com/')
+                if start < 0:
+                    return {'related_repositories': related}
+                # 只解码首个链接（留出 https://www. 前缀的长度）到文件末尾的部分
+                content = mm[max(0, start - len(b'https://www.')):].decode('utf-8', 'replace')
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        print(f"Error reading {readme_path}: {e}")
+        return {}
+    
+    for match in _GITHUB_REPO_RE.finditer(content):
+        owner = match.group(1)
+        repo = match.group(2).rstrip('.')
+        if repo.endswith('.git'):
+            repo = repo[:-4]
+        if (repo and owner.lower() not in _GITHUB_RESERVED_OWNERS
+                and not repo.lower().endswith(_IMAGE_SUFFIXES)):
+            related.add(f'https://github.com/{owner}/{repo}')
+    return {'related_repositories': related}
+
+def _metadata_files(repo_path: str) -> List[str]:
+    """按优先级返回要尝试读取的 metadata 文件
+
+    精简版只在不比 metadata.json 旧时使用：metadata.json 受 git 管理，
+    git pull 或手工修改后精简版已过期，此时直接读完整文件
+    """
+    full_file = os.path.join(repo_path, "metadata.json")
+    slim_file = os.path.join(repo_path, "metadata.slim.json")
+    try:
+        slim_mtime = os.stat(slim_file).st_mtime_ns
+    except FileNotFoundError:
+        return [full_file]
+    try:
+        if os.stat(full_file).st_mtime_ns > slim_mtime:
+            return [full_file]
+    except FileNotFoundError:
+        pass
+    return [slim_file, full_file]
+
+def _process_one_repo(repo_path: str) -> Tuple[str, Dict, List[Tuple]]:
+    """处理单个仓库目录（在进程池子进程中运行），返回 (仓库名, metadata 实体, 候选三元组)"""
+    repo_dir = os.path.basename(repo_path)
+    # 读取metadata：优先使用 fetch_repos.py 生成的精简版（不含 releases 等未用字段）
+    metadata_entities = {}
+    for metadata_file in _metadata_files(repo_path):
+        try:
+            metadata_entities = extract_from_metadata(metadata_file, repo_dir)
+        except FileNotFoundError:
+            continue
+        # 精简版解析失败（返回空）时继续尝试完整的 metadata.json
+        if metadata_entities:
+            break
+    # README 提取相关仓库（不提取 releases）
+    readme_entities = {}
+    try:
+        readme_entities = extract_from_readme(os.path.join(repo_path, 'README.md'))
+    except FileNotFoundError:
+        pass
+    # 去重排序也在子进程内完成，主进程只需按仓库名顺序拼接
+    triples = sorted(set(build_repo_triples(repo_dir, metadata_entities, readme_entities)))
+    return repo_dir, metadata_entities, triples
 
 class RuleExtractor:
-    def __init__(self, base_path: str = "/home/byx/projects/OpenKG-GitHubRepository-KG"):
+    def __init__(self, base_path: str = "/home/byx/projects/OpenKG-GitHubRepository-KG",
+                 out_format: str = "csv", workers: Optional[int] = None):
+        if out_format not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported out_format: {out_format}")
         self.base_path = base_path
+        self.out_format = out_format
+        # 进程池大小，None 时为 CPU 核数；为 1 时不建进程池，串行处理
+        self.workers = workers
         self.raw_data_path = os.path.join(base_path, "data/raw")
         self.entities_path = os.path.join(base_path, "data/entities")
         self.triples_path = os.path.join(base_path, "data/triples")
@@ -34,89 +193,52 @@ class RuleExtractor:
         # releases 不再处理（按要求忽略 release 相关）
         self.contributors = set()
         
-        # 候选三元组列表
-        self.candidate_triples = []
+        # 按仓库保存的候选三元组（各自已去重排序）；主语即仓库名，仓库之间不会重复
+        self.repo_triples: Dict[str, List[Tuple]] = {}
     
     def extract_from_metadata(self, metadata_path: str, repo_name: str) -> Dict:
         """从metadata.json文件提取实体信息"""
-        try:
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-            
-            entities = {
-                'repository': repo_name,
-                'stars': metadata.get('stars', 0),
-                'contributors': metadata.get('contributors', []),
-                'license': metadata.get('license', ''),
-                'tags': metadata.get('topics', []),
-                # languages 在 fetch_repos.py 中已保存为列表
-                'languages': metadata.get('languages', []),
-                'url': metadata.get('url', '')
-            }
-            
-            return entities
-        except Exception as e:
-            print(f"Error reading {metadata_path}: {e}")
-            return {}
+        return extract_from_metadata(metadata_path, repo_name)
     
     def extract_from_readme(self, readme_path: str) -> Dict:
-        """从README文件提取相关仓库信息（目前不提取额外实体）"""
-        # 保留接口以便未来扩展
-        return {}
+        """从README文件提取相关仓库链接"""
+        return extract_from_readme(readme_path)
     
     def process_repositories(self):
-        """处理raw目录下的所有仓库"""
-        for repo_dir in os.listdir(self.raw_data_path):
-            repo_path = os.path.join(self.raw_data_path, repo_dir)
-            
-            if not os.path.isdir(repo_path):
-                continue
-            
+        """处理raw目录下的所有仓库：各仓库在子进程中独立解析并生成三元组，主进程只做归并"""
+        # scandir 的 DirEntry 自带目录项类型，is_dir() 无需额外 stat
+        with os.scandir(self.raw_data_path) as it:
+            repo_paths = [entry.path for entry in it if entry.is_dir()]
+        
+        # 单进程时进程池的启动与序列化开销得不偿失，直接串行处理
+        workers = self.workers or os.cpu_count() or 1
+        if workers == 1:
+            self._merge_results(map(_process_one_repo, repo_paths))
+            return
+        # JSON 解析与正则扫描是 CPU 密集型，受 GIL 限制，改用进程池；map 保持原有顺序
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            self._merge_results(executor.map(_process_one_repo, repo_paths, chunksize=32))
+    
+    def _merge_results(self, results):
+        """把各仓库的处理结果归并到实体集合和三元组中"""
+        for repo_dir, metadata_entities, triples in results:
             # 添加仓库名称
             self.repositories.add(repo_dir)
-            
-            # 处理metadata.json
-            metadata_file = os.path.join(repo_path, "metadata.json")
-            if os.path.exists(metadata_file):
-                metadata_entities = self.extract_from_metadata(metadata_file, repo_dir)
-                self._collect_entities(metadata_entities)
-                # 按仓库生成候选三元组（基于该仓库的实际信息），不做跨仓库笛卡尔积
-                for lang in metadata_entities.get('languages', []):
-                    if lang:
-                        self.candidate_triples.append((repo_dir, 'uses_language', lang))
-                lic = metadata_entities.get('license')
-                if lic:
-                    self.candidate_triples.append((repo_dir, 'has_license', lic))
-                for tag in metadata_entities.get('tags', []):
-                    if tag:
-                        self.candidate_triples.append((repo_dir, 'has_tag', tag))
-                # 星数三元组
-                stars = metadata_entities.get('stars')
-                if stars is not None:
-                    self.candidate_triples.append((repo_dir, 'has_stars', stars))
-                # 仓库链接三元组
-                url = metadata_entities.get('url')
-                if url:
-                    self.candidate_triples.append((repo_dir, 'has_url', url))
-                # 贡献者三元组
-                for contrib in metadata_entities.get('contributors', []):
-                    if contrib:
-                        self.candidate_triples.append((repo_dir, 'has_contributor', contrib))
-            # README 可选处理（目前不提取 releases）
-            # readme_file = os.path.join(repo_path, 'README.md')
-            # if os.path.exists(readme_file):
-            #     _ = self.extract_from_readme(readme_file)
+            self._collect_entities(metadata_entities)
+            # 谓语和宾语（语言、标签、许可证、贡献者等）同样驻留，与实体集合共享同一份字符串
+            self.repo_triples[repo_dir] = [(repo_dir, _intern(p), _intern(o)) for _, p, o in triples]
     
     def _collect_entities(self, entities: Dict):
         """收集提取到的实体"""
+        # 驻留只在主进程归并时做：子进程中驻留的字符串经 pickle 回传后就不再是同一对象
         if entities.get('license'):
-            self.licenses.add(entities['license'])
+            self.licenses.add(_intern(entities['license']))
         
-        self.languages.update(entities.get('languages', []))
-        self.tags.update(entities.get('tags', []))
+        self.languages.update(map(_intern, entities.get('languages', [])))
+        self.tags.update(map(_intern, entities.get('tags', [])))
         # 不再收集 releases
         # 收集贡献者为实体
-        self.contributors.update(entities.get('contributors', []))
+        self.contributors.update(map(_intern, entities.get('contributors', [])))
     
     def save_entities(self):
         """保存实体表到CSV文件"""
@@ -131,12 +253,11 @@ class RuleExtractor:
         
         for entity_type, entities in entity_types.items():
             file_path = os.path.join(self.entities_path, f"{entity_type}_entities.csv")
-            with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            with open(file_path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as f:
                 writer = csv.writer(f)
                 writer.writerow(['name'])
-                for entity in sorted(entities):
-                    if entity:  # 跳过空值
-                        writer.writerow([entity])
+                # 跳过空值
+                writer.writerows([entity] for entity in sorted(entities) if entity)
             print(f"Saved {len(entities)} {entity_type} to {file_path}")
     
     def generate_candidate_triples(self):
@@ -144,15 +265,57 @@ class RuleExtractor:
         # 直接保存已生成的候选三元组（不再做跨仓库笛卡尔积，也不生成 release 相关三元组）
         self._save_triples()
     
+    def iter_candidate_triples(self) -> Iterator[Tuple]:
+        """按 (主语, 谓语, 宾语) 顺序逐条产出候选三元组，写文件时无需再构造全局列表"""
+        for repo_dir in sorted(self.repo_triples):
+            yield from self.repo_triples[repo_dir]
+    
+    def _count_triples(self) -> int:
+        """候选三元组总数"""
+        return sum(map(len, self.repo_triples.values()))
+    
     def _save_triples(self):
-        """保存候选三元组到CSV文件"""
+        """保存候选三元组到CSV（或Parquet）文件"""
+        if self.out_format == "parquet":
+            self._save_triples_parquet()
+            return
         triples_file = os.path.join(self.triples_path, "candidate_triples.csv")
-        with open(triples_file, 'w', newline='', encoding='utf-8') as f:
+        with open(triples_file, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as f:
             writer = csv.writer(f)
             writer.writerow(['subject', 'predicate', 'object'])
-            for triple in self.candidate_triples:
-                writer.writerow(triple)
-        print(f"Saved {len(self.candidate_triples)} candidate triples to {triples_file}")
+            writer.writerows(self.iter_candidate_triples())
+        print(f"Saved {self._count_triples()} candidate triples to {triples_file}")
+    
+    def _save_triples_parquet(self, batch_size: int = 100_000):
+        """保存候选三元组到Parquet文件，列式存储便于下游加载
+
+        subject/predicate 大量重复，用字典编码列存储；按批写入，内存只需容纳一批
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = pa.schema([
+            ('subject', pa.dictionary(pa.int32(), pa.string())),
+            ('predicate', pa.dictionary(pa.int8(), pa.string())),
+            # 星数等非字符串取值统一转为字符串，与CSV内容一致
+            ('object', pa.string()),
+        ])
+        triples_file = os.path.join(self.triples_path, "candidate_triples.parquet")
+        count = 0
+        triples = self.iter_candidate_triples()
+        with pq.ParquetWriter(triples_file, schema, compression='zstd') as writer:
+            while True:
+                batch = list(islice(triples, batch_size))
+                if not batch:
+                    break
+                subjects, predicates, objects = zip(*batch)
+                writer.write_table(pa.table([
+                    pa.array(subjects, type=schema.field('subject').type),
+                    pa.array(predicates, type=schema.field('predicate').type),
+                    pa.array([str(o) for o in objects], type=pa.string()),
+                ], schema=schema))
+                count += len(batch)
+        print(f"Saved {count} candidate triples to {triples_file}")
     
     def run(self):
         """运行完整的抽取流程"""